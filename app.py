@@ -1,7 +1,7 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import requests
 import preprocessing as pp
 
 # -----------------------------------------------------------------------------
@@ -15,7 +15,7 @@ st.set_page_config(
 )
 
 # Custom Dark Theme & CSS
-st.markdown("""
+_CSS = """
 <style>
     /* Main Background */
     .stApp {
@@ -66,7 +66,80 @@ st.markdown("""
         background: rgba(0,0,0,0) !important;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+@st.cache_resource
+def _inject_css():
+    st.markdown(_CSS, unsafe_allow_html=True)
+
+_inject_css()
+
+# -----------------------------------------------------------------------------
+# Constants
+# -----------------------------------------------------------------------------
+# Color Scale Mapping
+color_scales = {
+    "Recorded Forest Area - Total": "Greens",
+    "Tree Cover - Area": "YlGn",
+    "Precipitation_mm": "Blues",
+    "Mangroves (2023)": "Teal"
+}
+
+# Dynamic explanation per map metric
+explanations = {
+    "Recorded Forest Area - Total": "Shows the legal status of the land. High values mean more land is legally designated as forest, regardless of actual tree cover.",
+    "Tree Cover - Area": "Actual green cover outside designated forest areas. High values indicate good extensive greenery in cities/farms.",
+    "Precipitation_mm": "Average annual rainfall. Crucial for understanding if forest growth is supported by climate.",
+    "Mangroves (2023)": "Coastal buffer zones. Only visible in coastal states (WB, Gujarat, etc). Critical for flood protection."
+}
+
+# -----------------------------------------------------------------------------
+# Leaderboard HTML Table (Dark Mode)
+# -----------------------------------------------------------------------------
+# Static header/footer built once; rows are joined per render
+# Reduced min-height to eliminate extra space while keeping symmetry
+_TABLE_HEAD_TMPL = (
+    '<div style="background-color: #262730; padding: 15px; border-radius: 10px; border: 1px solid #4f4f4f; min-height: 440px; display: flex; flex-direction: column;">'
+    '<h4 style="color: {color_theme}; text-align: center; margin-bottom: 8px; font-size: 1.1rem;">{title}</h4>'
+    '<div style="flex-grow: 1; overflow-x: auto;">'
+    '<table style="width: 100%; border-collapse: collapse; color: #e0e0e0; table-layout: fixed; font-size: 14px; margin-bottom: 0;">'
+    '<thead>'
+    '<tr style="border-bottom: 2px solid #4f4f4f;">'
+    '<th style="padding: 8px 5px; text-align: left; width: 62%;">State</th>'
+    '<th style="padding: 8px 5px; text-align: right; width: 38%;">Change<br>(sq km)</th>'
+    '</tr></thead><tbody>'
+)
+_ROW_TMPL = (
+    '<tr style="border-bottom: 1px solid #383838;">'
+    '<td style="padding: 10px 5px; vertical-align: middle; line-height: 1.2; word-wrap: break-word;">{state}</td>'
+    '<td style="padding: 10px 5px; text-align: right; color: {color}; font-weight: bold; vertical-align: middle;">{val:+.2f}</td>'
+    '</tr>'
+)
+_TABLE_FOOT = '</tbody></table></div></div>'
+
+def render_custom_table(df, title, color_theme):
+    rows = "".join(
+        _ROW_TMPL.format(state=t.State, val=t.Delta, color=("#66bb6a" if t.Delta > 0 else "#ef5350"))
+        for t in df.itertuples(index=False)
+    )
+    return _TABLE_HEAD_TMPL.format(title=title, color_theme=color_theme) + rows + _TABLE_FOOT
+
+# -----------------------------------------------------------------------------
+# State Drill-Down Report Card
+# -----------------------------------------------------------------------------
+@st.cache_data
+def build_drilldown_html(state, geo_area, rainfall, mangrove):
+    # Scalar args keep the cache key cheap to hash
+    return f"""
+        <div style="background-color: #262730; padding: 20px; border-radius: 10px; border: 1px solid #4f4f4f; margin-top: 20px;">
+            <h4>📜 Analysis for {state}</h4>
+            <p>
+                {state} covers a geographical area of <b>{geo_area:,.0f} sq km</b>.
+                The rain pattern is approximately <b>{rainfall} mm</b> annually.
+                {'Significant mangrove presence detected.' if mangrove > 50 else 'No major mangrove ecosystem detected.'}
+            </p>
+        </div>
+        """
 
 # -----------------------------------------------------------------------------
 # Data Loading
@@ -75,18 +148,61 @@ st.markdown("""
 def get_data():
     return pp.load_data()
 
+# Read-only dict: cache_resource shares it instead of unpickling a copy per rerun
+@st.cache_resource(ttl=86400)
+def get_geojson():
+    return pp.load_geojson()
+
+@st.cache_resource
+def build_choropleth(master_df, _geojson, map_metric, max_val):
+    # One finished figure per metric; the cached object is never mutated afterwards
+    fig = px.choropleth(
+        master_df,
+        geojson=_geojson,
+        featureidkey='properties.ST_NM',
+        locations='State',
+        color=map_metric,
+        color_continuous_scale=color_scales.get(map_metric, "Viridis"),
+        range_color=(0, max_val),
+        hover_name='State',
+        hover_data={
+            map_metric: True,
+            'State': False
+        },
+        title=f"India: {map_metric} Distribution"
+    )
+    
+    # Enhanced Geo Layout - Focus on India, remove World Noise
+    fig.update_geos(
+        # fitbounds="locations", # Removed as it fights with manual range sometimes
+        visible=True, 
+        showcountries=True, countrycolor="#4a4a4a",
+        showsubunits=True, subunitcolor="#4a4a4a",
+        showocean=True, oceancolor="#1e212b",
+        showland=True, landcolor="#0e1117",
+        bgcolor='rgba(0,0,0,0)',
+        # Strict Bounding Box for India
+        lataxis_range=[6, 38],
+        lonaxis_range=[68, 98]
+    )
+    
+    fig.update_layout(
+        height=650,
+        margin={"r":0,"t":40,"l":0,"b":0},
+        template="plotly_dark",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color="white"),
+        coloraxis_colorbar=dict(title=dict(text="Scale", side="right"))
+    )
+    return fig
+
 data_dict, error = get_data()
 
 if error:
     st.error(f"Failed to load data: {error}")
     st.stop()
 
-df_forest = data_dict['forest']
-df_tree = data_dict['tree']
-df_mangrove = data_dict['mangrove']
-df_agro = data_dict['agro']
-master_df = data_dict['master']
-
 # -----------------------------------------------------------------------------
 # Sidebar & Navigation
 # -----------------------------------------------------------------------------
@@ -105,33 +221,21 @@ st.sidebar.caption("Data Source: India State of Forest Report (ISFR)")
 # -----------------------------------------------------------------------------
 # Page 1: Executive Summary
 # -----------------------------------------------------------------------------
-if page == "Executive Summary":
+def page_summary(data):
+    master_df = data['master']
+
     st.title("🇮🇳 National Forest Cover: Executive Summary")
     
     # 2001 Methodology Change Alert
-    st.warning("⚠️ **Data Health Alert:** Standard cleaning methodology was revised in 2001. Comparisons pre-2001 should be interpreted with caution.")
+    with st.expander("⚠️ Data Health Alert", expanded=False):
+        st.warning("⚠️ **Data Health Alert:** Standard cleaning methodology was revised in 2001. Comparisons pre-2001 should be interpreted with caution.")
 
-    # KPI Metrics
-    # Calculate Total Forest Area (Current)
-    total_forest_current = master_df['Recorded Forest Area - Total'].sum()
-    
-    # Calculate previous reference (SFR 2005) if available
-    if 'Recorded Forest Area as in SFR 2005' in df_forest.columns:
-        # Need to clean that column too if not done in preprocessing, assume it needs cleaning inside the metric calculation for safety
-        # Actually preprocessing only cleaned specific cols, let's do a quick local clean if needed or rely on robust preprocessing
-        # Checking preprocessing.py... it only cleaned 'Recorded Forest Area - Total'. 
-        # I need to clean SFR 2005 here or it might be strings.
-        sfr_2005_series = df_forest['Recorded Forest Area as in SFR 2005'].astype(str).str.replace(',', '', regex=True)
-        sfr_2005_total = pd.to_numeric(sfr_2005_series, errors='coerce').sum()
-        
-        pct_change = ((total_forest_current - sfr_2005_total) / sfr_2005_total) * 100
-    else:
-        sfr_2005_total = total_forest_current # Fallback
-        pct_change = 0.0
+    # KPI Metrics (precomputed in preprocessing)
+    kpis = data['kpis']
 
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Recorded Forest Area", f"{total_forest_current:,.0f} sq km", delta=f"{pct_change:.2f}% vs 2005")
-    col2.metric("Total Tree Cover", f"{master_df['Tree Cover - Area'].sum():,.0f} sq km")
+    col1.metric("Total Recorded Forest Area", f"{kpis['total_forest']:,.0f} sq km", delta=f"{kpis['pct_change']:.2f}% vs 2005")
+    col2.metric("Total Tree Cover", f"{kpis['total_tree']:,.0f} sq km")
     col3.metric("Data Reporting States", f"{len(master_df)}")
 
     st.markdown("---")
@@ -155,7 +259,7 @@ if page == "Executive Summary":
         yaxis='y2'
     ))
 
-    fig.add_trace(go.Scatter(
+    fig.add_trace(go.Scattergl(
         x=chart_df['State'],
         y=chart_df['Recorded Forest Area - Total'],
         name='Forest Cover (sq km)',
@@ -182,7 +286,9 @@ if page == "Executive Summary":
 # -----------------------------------------------------------------------------
 # Page 2: Deep Dive (Statistical Insights)
 # -----------------------------------------------------------------------------
-elif page == "Deep Dive Data":
+def page_deep_dive(data):
+    df_forest = data['forest']
+
     st.title("📊 Deep Dive: Forest Quality & Trends")
 
     col_a, col_b = st.columns([1, 1])
@@ -191,25 +297,8 @@ elif page == "Deep Dive Data":
         st.subheader("Forest Composition (Quality Proxy)")
         st.caption("Ratio of Reserved (High Protection) vs. Protected/Unclassed Forests")
         
-        # Proxy Data for Quality: Reserved, Protected, Unclassed
-        # We need to clean these columns first as preprocessing only did 'Total'
-        for c in ['Recorded Forest Area - Reserved Forests', 'Recorded Forest Area - Protected Forests', 'Recorded Forest Area - Unclassed Forests']:
-            if c in df_forest.columns:
-                df_forest[c] = pd.to_numeric(df_forest[c].astype(str).str.replace(',', '', regex=True), errors='coerce').fillna(0)
-
-        # Melt for Stacked Area/Bar
-        quality_df = df_forest.melt(id_vars=['State'], 
-                                   value_vars=['Recorded Forest Area - Reserved Forests', 
-                                               'Recorded Forest Area - Protected Forests', 
-                                               'Recorded Forest Area - Unclassed Forests'],
-                                   var_name='Forest Type', value_name='Area')
-        
-        # Clean labels
-        quality_df['Forest Type'] = quality_df['Forest Type'].str.replace('Recorded Forest Area - ', '')
-        
-        # Sort by Total area to keep the chart clean
-        top_states = df_forest.sort_values('Recorded Forest Area - Total', ascending=False).head(10)['State']
-        quality_df_filtered = quality_df[quality_df['State'].isin(top_states)]
+        # Top 10 states, melted per forest type (precomputed in preprocessing)
+        quality_df_filtered = data['quality_long']
 
         fig_quality = px.area(quality_df_filtered, x='State', y='Area', color='Forest Type',
                              color_discrete_map={
@@ -231,46 +320,11 @@ elif page == "Deep Dive Data":
         st.caption("Top Gainers & Losers (vs 2005 Baseline)")
         
         # Filter out 'Total' row if present to avoid skewing leaderboard
-        df_forest = df_forest[df_forest['State'] != 'Total']
-        
-        # Calculate Delta
-        col_sfr = 'Recorded Forest Area as in SFR 2005'
-        col_cur = 'Recorded Forest Area - Total'
-        
-        df_forest['SFR_2005_Clean'] = pd.to_numeric(df_forest[col_sfr].astype(str).str.replace(',', '', regex=True), errors='coerce').fillna(0)
-        df_forest['Delta'] = df_forest[col_cur] - df_forest['SFR_2005_Clean']
+        local_forest = df_forest.loc[df_forest['State'] != 'Total', ['State', 'Delta']]
         
-        # Sort
-        df_sorted = df_forest.sort_values('Delta', ascending=False)
-        
-        top_gainers = df_sorted.head(5)[['State', 'Delta']]
-        top_losers = df_sorted.tail(5)[['State', 'Delta']].sort_values('Delta', ascending=True)
-
-        # Custom HTML Table Styles for Dark Mode
-        def render_custom_table(df, title, color_theme):
-            # Reduced min-height to eliminate extra space while keeping symmetry
-            html = f'<div style="background-color: #262730; padding: 15px; border-radius: 10px; border: 1px solid #4f4f4f; min-height: 440px; display: flex; flex-direction: column;">'
-            html += f'<h4 style="color: {color_theme}; text-align: center; margin-bottom: 8px; font-size: 1.1rem;">{title}</h4>'
-            html += '<div style="flex-grow: 1; overflow-x: auto;">' 
-            html += '<table style="width: 100%; border-collapse: collapse; color: #e0e0e0; table-layout: fixed; font-size: 14px; margin-bottom: 0;">'
-            html += '<thead>'
-            html += '<tr style="border-bottom: 2px solid #4f4f4f;">'
-            html += '<th style="padding: 8px 5px; text-align: left; width: 62%;">State</th>'
-            html += '<th style="padding: 8px 5px; text-align: right; width: 38%;">Change<br>(sq km)</th>'
-            html += '</tr></thead><tbody>'
-            
-            for _, row in df.iterrows():
-                val = row['Delta']
-                val_fmt = f"{val:+.2f}"
-                color = "#66bb6a" if val > 0 else "#ef5350"
-                
-                html += f'<tr style="border-bottom: 1px solid #383838;">'
-                html += f'<td style="padding: 10px 5px; vertical-align: middle; line-height: 1.2; word-wrap: break-word;">{row["State"]}</td>'
-                html += f'<td style="padding: 10px 5px; text-align: right; color: {color}; font-weight: bold; vertical-align: middle;">{val_fmt}</td>'
-                html += '</tr>'
-            
-            html += '</tbody></table></div></div>'
-            return html
+        # Top/Bottom 5 (partial selection, no full sort needed)
+        top_gainers = local_forest.nlargest(5, 'Delta')
+        top_losers = local_forest.nsmallest(5, 'Delta')
 
         col_g, col_l = st.columns(2)
         with col_g:
@@ -282,7 +336,9 @@ elif page == "Deep Dive Data":
 # -----------------------------------------------------------------------------
 # Page 3: Geospatial Intelligence
 # -----------------------------------------------------------------------------
-elif page == "Geospatial Intelligence":
+def page_geo(data):
+    master_df = data['master']
+
     st.title("🗺️ Geospatial Intelligence Hub")
     
     # Layout: Map Control & Main Map
@@ -295,82 +351,22 @@ elif page == "Geospatial Intelligence":
             ["Recorded Forest Area - Total", "Tree Cover - Area", "Precipitation_mm", "Mangroves (2023)"],
             captions=["Total official forest area", "Tree cover outside forests", "Annual Rainfall", "Coastal Mangrove spread"]
         )
-        
-        # Color Scale Mapping
-        color_scales = {
-            "Recorded Forest Area - Total": "Greens",
-            "Tree Cover - Area": "YlGn",
-            "Precipitation_mm": "Blues",
-            "Mangroves (2023)": "Teal"
-        }
-        
-        # Add Mangrove data to master_df for mapping if selected
-        # We need to treat 'master_df' carefully. It has Forest, Tree, Agro.
-        # Mangrove is in df_mangrove. Let's merge the latest mangrove year (2023) into master if needed.
-        if "Mangroves (2023)" == map_metric:
-            # Quick merge for 2023 Snapshot
-            mangrove_2023 = df_mangrove[df_mangrove['year'] == 2023]
-            if 'Mangroves (2023)' not in master_df.columns:
-                master_df = pd.merge(master_df, mangrove_2023[['State', 'value']], on='State', how='left').rename(columns={'value': 'Mangroves (2023)'})
-            master_df['Mangroves (2023)'] = master_df['Mangroves (2023)'].fillna(0)
-
-    # GeoJSON
-    geojson_url = pp.get_geojson_url()
+
+    # GeoJSON (cached so reruns skip the download & parse; failures are not cached)
+    try:
+        geojson = get_geojson()
+    except requests.RequestException as e:
+        st.error(f"Failed to load map boundaries: {e}")
+        return
     
     # Map Plotting
-    max_val = master_df[map_metric].max()
+    max_val = data['max_by_metric'][map_metric]
     
-    fig_map = px.choropleth(
-        master_df,
-        geojson=geojson_url,
-        featureidkey='properties.ST_NM',
-        locations='State',
-        color=map_metric,
-        color_continuous_scale=color_scales.get(map_metric, "Viridis"),
-        range_color=(0, max_val),
-        hover_name='State',
-        hover_data={
-            map_metric: True,
-            'State': False
-        },
-        title=f"India: {map_metric} Distribution"
-    )
-    
-    # Enhanced Geo Layout - Focus on India, remove World Noise
-    fig_map.update_geos(
-        # fitbounds="locations", # Removed as it fights with manual range sometimes
-        visible=True, 
-        showcountries=True, countrycolor="#4a4a4a",
-        showsubunits=True, subunitcolor="#4a4a4a",
-        showocean=True, oceancolor="#1e212b",
-        showland=True, landcolor="#0e1117",
-        bgcolor='rgba(0,0,0,0)',
-        # Strict Bounding Box for India
-        lataxis_range=[6, 38],
-        lonaxis_range=[68, 98]
-    )
-    
-    fig_map.update_layout(
-        height=650,
-        margin={"r":0,"t":40,"l":0,"b":0},
-        template="plotly_dark",
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color="white"),
-        coloraxis_colorbar=dict(title=dict(text="Scale", side="right"))
-    )
+    fig_map = build_choropleth(master_df, geojson, map_metric, max_val)
     
     with col_map:
         st.plotly_chart(fig_map, use_container_width=True)
         
-        # dynamic explanation
-        explanations = {
-            "Recorded Forest Area - Total": "Shows the legal status of the land. High values mean more land is legally designated as forest, regardless of actual tree cover.",
-            "Tree Cover - Area": "Actual green cover outside designated forest areas. High values indicate good extensive greenery in cities/farms.",
-            "Precipitation_mm": "Average annual rainfall. Crucial for understanding if forest growth is supported by climate.",
-            "Mangroves (2023)": "Coastal buffer zones. Only visible in coastal states (WB, Gujarat, etc). Critical for flood protection."
-        }
-        
         st.info(f"ℹ️ **What am I looking at?**\n\n{explanations.get(map_metric, 'N/A')}")
 
 
@@ -380,10 +376,10 @@ elif page == "Geospatial Intelligence":
     st.subheader("🔍 State Drill-Down Analysis")
     st.caption("Select a state below to view its complete forestry profile.")
 
-    selected_state = st.selectbox("Select State:", options=sorted(master_df['State'].unique()))
+    selected_state = st.selectbox("Select State:", options=data['state_options'])
     
     if selected_state:
-        state_data = master_df[master_df['State'] == selected_state].iloc[0]
+        state_data = data['master_by_state'].loc[selected_state]
         
         # Card UI
         with st.container():
@@ -392,18 +388,25 @@ elif page == "Geospatial Intelligence":
             c2.metric("🌳 Tree Cover", f"{state_data.get('Tree Cover - Area', 0):,.0f} sq km")
             c3.metric("🌧️ Rainfall", f"{state_data.get('Precipitation_mm', 0):,.0f} mm")
             
-            # Mangrove (if exists in master_df, else check df_mangrove)
-            mangrove_val = df_mangrove[(df_mangrove['State'] == selected_state) & (df_mangrove['year'] == 2023)]['value'].sum()
+            # Mangrove (precomputed (State, year) lookup)
+            mangrove_val = data['mangrove_lookup'].get((selected_state, 2023), 0.0)
             c4.metric("🌊 Mangrove (2023)", f"{mangrove_val:,.2f} sq km")
             
-        st.markdown(f"""
-        <div style="background-color: #262730; padding: 20px; border-radius: 10px; border: 1px solid #4f4f4f; margin-top: 20px;">
-            <h4>📜 Analysis for {selected_state}</h4>
-            <p>
-                {selected_state} covers a geographical area of <b>{state_data.get('Geographical Area', 0):,.0f} sq km</b>.
-                The rain pattern is approximately <b>{state_data.get('Precipitation_mm', 'N/A')} mm</b> annually.
-                {'Significant mangrove presence detected.' if mangrove_val > 50 else 'No major mangrove ecosystem detected.'}
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(build_drilldown_html(
+            selected_state,
+            state_data.get('Geographical Area', 0),
+            state_data.get('Precipitation_mm', 'N/A'),
+            mangrove_val
+        ), unsafe_allow_html=True)
+
+
+# -----------------------------------------------------------------------------
+# Page Dispatch (only the selected page runs)
+# -----------------------------------------------------------------------------
+PAGES = {
+    "Executive Summary": page_summary,
+    "Deep Dive Data": page_deep_dive,
+    "Geospatial Intelligence": page_geo
+}
 
+PAGES[page](data_dict)
@@ -1,6 +1,5 @@
 
 import preprocessing as pp
-import requests
 import pandas as pd
 import json
 
@@ -10,25 +9,19 @@ master_df = data_dict['master']
 print("Data Loaded.")
 
 # Load GeoJSON
-geojson_url = pp.get_geojson_url()
-response = requests.get(geojson_url)
-geojson = response.json()
+geojson = pp.load_geojson()
 
 # Extract State Names from GeoJSON
-geojson_states = set()
-for feature in geojson['features']:
-    props = feature['properties']
-    if len(geojson_states) == 0:
-        print(f"First Feature Keys: {props.keys()}")
-    
-    if 'st_nm' in props:
-        geojson_states.add(props['st_nm'])
-    elif 'state_name' in props:
-        geojson_states.add(props['state_name'])
-    elif 'NAME_1' in props:
-        geojson_states.add(props['NAME_1'])
-    else:
-        print(f"Unknown properties: {props.keys()}")
+# Detect the state-name property once from the first feature, then read it from all
+props = geojson['features'][0]['properties']
+print(f"First Feature Keys: {props.keys()}")
+
+key = next((k for k in ('ST_NM', 'st_nm', 'state_name', 'NAME_1') if k in props), None)
+if key is None:
+    print(f"Unknown properties: {props.keys()}")
+    geojson_states = set()
+else:
+    geojson_states = {f['properties'][key] for f in geojson['features']}
 
 print(f"\nGeoJSON States ({len(geojson_states)}):")
 print(sorted(list(geojson_states)))
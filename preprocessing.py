@@ -1,5 +1,185 @@
+import os
+import tempfile
 import pandas as pd
 import numpy as np
+import requests
+
+try:
+    import numba
+except ImportError:  # Optional: only used to parse very large columns
+    numba = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: without it datasets are read straight from CSV
+    pa = pq = None
+
+# Below this many rows the pandas string path is fast enough
+NUMBA_MIN_ROWS = 10_000
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _parse_ascii(buf):
+        """
+        Parses a (rows x width) uint8 buffer of ASCII numbers, ignoring commas.
+        Only handles [ws][sign]digits[.digits][e[sign]digits][ws] where the result is
+        exactly representable via one multiply/divide by a power of ten (so it rounds
+        like pd.to_numeric). Returns (values, ok); rows with ok=False must be re-parsed.
+        """
+        n, width = buf.shape
+        out = np.full(n, np.nan)
+        ok = np.zeros(n, dtype=np.bool_)
+        for i in range(n):
+            mantissa = 0.0
+            decimals = 0
+            digits = 0
+            sign = 1.0
+            exp_val = 0
+            exp_sign = 1
+            exp_digits = 0
+            exp_signed = False
+            state = 0  # 0 leading ws, 1 after sign, 2 int part, 3 frac part, 4 exponent, 5 trailing ws
+            good = True
+            for j in range(width):
+                c = buf[i, j]
+                if c == 0:  # Fixed-width padding
+                    break
+                if c == 44:  # ',' is removed by the pandas path too
+                    continue
+                if c == 32 or 9 <= c <= 13:  # Whitespace: only allowed around the number
+                    if state == 0 or state == 5:
+                        continue
+                    if state == 1 or (state == 4 and exp_digits == 0):
+                        good = False
+                        break
+                    state = 5
+                elif state == 5:
+                    good = False
+                    break
+                elif state == 0 and (c == 45 or c == 43):  # Leading '-' or '+'
+                    if c == 45:
+                        sign = -1.0
+                    state = 1
+                elif state == 4 and (c == 45 or c == 43) and exp_digits == 0 and not exp_signed:
+                    if c == 45:
+                        exp_sign = -1
+                    exp_signed = True
+                elif 48 <= c <= 57:
+                    if state == 4:
+                        exp_val = exp_val * 10 + (c - 48)
+                        exp_digits += 1
+                        if exp_val > 400:
+                            good = False
+                            break
+                    else:
+                        mantissa = mantissa * 10.0 + (c - 48)
+                        digits += 1
+                        if state == 3:
+                            decimals += 1
+                        else:
+                            state = 2
+                        if mantissa > 9007199254740992.0:  # 2**53, no longer exact
+                            good = False
+                            break
+                elif c == 46 and state <= 2:  # '.'
+                    state = 3
+                elif (c == 101 or c == 69) and digits > 0 and (state == 2 or state == 3):  # 'e' / 'E'
+                    state = 4
+                else:
+                    good = False
+                    break
+            if not good or digits == 0:
+                continue
+            if state == 4 and exp_digits == 0:
+                continue
+            power = exp_sign * exp_val - decimals
+            if power > 22 or power < -22:
+                continue
+            scale = 1.0
+            for _ in range(abs(power)):
+                scale *= 10.0
+            out[i] = sign * (mantissa * scale if power >= 0 else mantissa / scale)
+            ok[i] = True
+        return out, ok
+
+def _to_numeric_pandas(s):
+    return pd.to_numeric(s.str.replace(',', '', regex=False), errors='coerce')
+
+def _clean_numeric_col(s):
+    """Strips thousand separators (e.g. "2,75,069") and coerces a column to float."""
+    strs = s.astype(str)
+    if numba is not None and len(s) > NUMBA_MIN_ROWS:
+        filled = strs.fillna('')
+        width = max(int(filled.str.len().max()), 1)
+        try:
+            raw = filled.to_numpy(dtype=f'S{width}')
+        except UnicodeEncodeError:
+            raw = None  # Non-ASCII content, use the pandas path
+        if raw is not None:
+            values, ok = _parse_ascii(raw.view(np.uint8).reshape(len(raw), width))
+            result = pd.Series(values, index=s.index, name=s.name)
+            # Anything outside the fast grammar goes through pandas for identical results
+            if not ok.all():
+                result[~ok] = _to_numeric_pandas(strs[~ok]).to_numpy(dtype=float)
+            return result.fillna(0)
+    # float64 like the Numba path, so the dtype doesn't depend on column length
+    return _to_numeric_pandas(strs).fillna(0).astype(float)
+
+# Mapping for common state name inconsistencies
+REPLACEMENTS = {
+    "A & N Islands": "Andaman & Nicobar Islands",
+    "Andaman & Nicobar": "Andaman & Nicobar Islands",
+    # Add more as discovered
+}
+
+def _clean_states(s):
+    """Standardizes a column of state names (strip, title-case, known aliases)."""
+    return s.str.strip().str.title().replace(REPLACEMENTS).fillna("Unknown")
+
+def _select_columns(df, columns):
+    return df[[c for c in columns if c in df.columns]]
+
+# Below this CSV size plain read_csv is faster than the Parquet round-trip
+# (stat calls + schema + read); measured crossover is ~50 KB, Parquet ~5x faster at 1 MB
+PARQUET_MIN_BYTES = 1024 * 1024
+
+def _read_table(csv_path, columns):
+    """
+    Reads `columns` (those that exist) from `csv_path`.
+    Large CSVs go through a Parquet copy, (re)built on first use or when the CSV is newer.
+    Falls back to the CSV if pyarrow is missing, the folder is read-only or Arrow
+    can't convert/read the data.
+    """
+    if pq is None or os.path.getsize(csv_path) < PARQUET_MIN_BYTES:
+        return _select_columns(pd.read_csv(csv_path), columns)
+
+    parquet_path = os.path.splitext(csv_path)[0] + ".parquet"
+    if not os.path.exists(parquet_path) or os.path.getmtime(parquet_path) < os.path.getmtime(csv_path):
+        df = pd.read_csv(csv_path)
+        tmp_path = None
+        try:
+            # Write to a temp file and swap it in, so a killed process never leaves
+            # a truncated file that looks fresh
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(parquet_path) or ".", suffix=".parquet.tmp")
+            os.close(fd)
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, parquet_path)
+        except (pa.ArrowException, OSError):
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return _select_columns(df, columns)
+
+    try:
+        available = set(pq.read_schema(parquet_path).names)
+        return pd.read_parquet(parquet_path, columns=[c for c in columns if c in available])
+    except (pa.ArrowException, OSError):
+        # Unreadable copy: drop it so the next load rebuilds it
+        try:
+            os.remove(parquet_path)
+        except OSError:
+            pass
+        return _select_columns(pd.read_csv(csv_path), columns)
 
 def load_data():
     """
@@ -17,101 +197,215 @@ def load_data():
     mangrove_path = "19360- Dataful/mangroves-year-and-state-wise-mangrove-forest-cover-in-india-since-1987.csv"
     agro_path = "Agro_India_States.csv"
 
+    # Only the columns used downstream are read
+    forest_read_cols = [
+        'State/UTs',
+        'Geographical Area',
+        'Recorded Forest Area as in SFR 2005',
+        'Recorded Forest Area - Reserved Forests',
+        'Recorded Forest Area - Protected Forests',
+        'Recorded Forest Area - Unclassed Forests',
+        'Recorded Forest Area - Total',
+    ]
+
     try:
-        df_forest = pd.read_csv(forest_path)
-        df_tree = pd.read_csv(tree_path)
-        df_mangrove = pd.read_csv(mangrove_path)
-        df_agro = pd.read_csv(agro_path)
+        df_forest = _read_table(forest_path, forest_read_cols)
+        df_tree = _read_table(tree_path, ['State/ Uts', 'Tree Cover - Area'])
+        df_mangrove = _read_table(mangrove_path, ['year', 'state', 'value'])
+        df_agro = _read_table(agro_path, ['States', 'Precipitation_mm'])
     except FileNotFoundError as e:
         return None, f"Error loading file: {e}"
 
     # 2. Clean & Standardize State Names
-    # Helper to standardize state names
-    def clean_state_name(name):
-        if pd.isna(name): return "Unknown"
-        name = name.strip().title()
-        # Mapping for common inconsistencies
-        replacements = {
-            "Andhra Pradesh": "Andhra Pradesh",
-            "Arunachal Pradesh": "Arunachal Pradesh",
-            "Jammu & Kashmir": "Jammu & Kashmir",
-            "A & N Islands": "Andaman & Nicobar Islands",
-            "Andaman & Nicobar": "Andaman & Nicobar Islands",
-            # Add more as discovered
-        }
-        return replacements.get(name, name)
-
     # Apply standardization
     # Adjust column names based on actual CSV headers
     # Forest Data
     # 'State/UTs' seems to be the column name from previous 'head' command
     if 'State/UTs' in df_forest.columns:
-        df_forest['State'] = df_forest['State/UTs'].apply(clean_state_name)
+        df_forest['State'] = _clean_states(df_forest['State/UTs'])
     
     # Tree Data
     # 'State/ Uts' (note the space)
     if 'State/ Uts' in df_tree.columns:
-        df_tree['State'] = df_tree['State/ Uts'].apply(clean_state_name)
+        df_tree['State'] = _clean_states(df_tree['State/ Uts'])
 
     # Mangrove Data
     # 'state'
     if 'state' in df_mangrove.columns:
-        df_mangrove['State'] = df_mangrove['state'].apply(clean_state_name)
+        df_mangrove['State'] = _clean_states(df_mangrove['state'])
 
     # Agro Data
     # 'States'
     if 'States' in df_agro.columns:
-        df_agro['State'] = df_agro['States'].apply(clean_state_name)
+        df_agro['State'] = _clean_states(df_agro['States'])
     
     # 3. Numeric Conversion
     # Several columns have commas (e.g., "2,75,069")
-    def clean_numeric(val):
-        if isinstance(val, str):
-            val = val.replace(',', '')
-            try:
-                return float(val)
-            except:
-                return 0.0
-        return val
-
-    # Apply to specific columns
-    # Example for Forest
-    forest_cols = ['Geographical Area', 'Recorded Forest Area - Total']
-    for col in forest_cols:
-        if col in df_forest.columns:
-            df_forest[col] = df_forest[col].apply(clean_numeric)
-
-    # Example for Mangroves
+    # Forest: clean every numeric column once here so app.py gets numeric dtypes
+    forest_cols = [
+        'Geographical Area',
+        'Recorded Forest Area - Total',
+        'Recorded Forest Area as in SFR 2005',
+        'Recorded Forest Area - Reserved Forests',
+        'Recorded Forest Area - Protected Forests',
+        'Recorded Forest Area - Unclassed Forests',
+    ]
+    forest_cols = [c for c in forest_cols if c in df_forest.columns]
+    df_forest[forest_cols] = df_forest[forest_cols].apply(_clean_numeric_col)
+
+    # Mangroves
     if 'value' in df_mangrove.columns:
-        df_mangrove['value'] = df_mangrove['value'].apply(clean_numeric)
+        df_mangrove['value'] = pd.to_numeric(_clean_numeric_col(df_mangrove['value']), downcast='float')
 
-    # Example for Tree
+    # Tree
     if 'Tree Cover - Area' in df_tree.columns:
-        df_tree['Tree Cover - Area'] = df_tree['Tree Cover - Area'].apply(clean_numeric)
+        df_tree['Tree Cover - Area'] = _clean_numeric_col(df_tree['Tree Cover - Area'])
 
     # 4. Merging (Creating a Master Dataset for Snapshot Analysis)
-    # We will merge on 'State'
+    # Single left join on a 'State' index (children aligned to the forest states)
     # Base it on Forest Data as it likely has most states
-    master_df = df_forest[['State', 'Recorded Forest Area - Total', 'Geographical Area']].copy()
+    master_idx = df_forest.set_index('State')[['Recorded Forest Area - Total', 'Geographical Area']]
     
-    # Merge Tree Cover
-    master_df = pd.merge(master_df, df_tree[['State', 'Tree Cover - Area']], on='State', how='left')
+    # Children are aggregated per State first so reindex never sees duplicate labels
+    # (e.g. two spellings that both map to "Andaman & Nicobar Islands")
+    # Tree Cover
+    children = [df_tree.groupby('State', sort=False)[['Tree Cover - Area']].sum()]
     
-    # Merge Agro (Rainfall) - 'Precipitation_mm'
+    # Agro (Rainfall) - 'Precipitation_mm' (averaged, rainfall isn't additive)
     if 'Precipitation_mm' in df_agro.columns:
-        master_df = pd.merge(master_df, df_agro[['State', 'Precipitation_mm']], on='State', how='left')
+        children.append(df_agro.groupby('State', sort=False)[['Precipitation_mm']].mean())
+
+    # Mangroves - latest snapshot (2023) for the map layer
+    if 'year' in df_mangrove.columns:
+        mangrove_2023 = df_mangrove.loc[df_mangrove['year'] == 2023, ['State', 'value']]
+        children.append(mangrove_2023.groupby('State', sort=False)[['value']].sum().rename(columns={'value': 'Mangroves (2023)'}))
+
+    master_df = pd.concat([master_idx] + [c.reindex(master_idx.index) for c in children], axis=1).reset_index()
 
     # Fill NaNs
     master_df.fillna(0, inplace=True)
 
+    # Downcast to the smallest dtype that holds the values (float32/int32 for sq km & mm)
+    for c in master_df.select_dtypes('float64').columns:
+        master_df[c] = pd.to_numeric(master_df[c], downcast='float')
+    for c in master_df.select_dtypes('int64').columns:
+        master_df[c] = pd.to_numeric(master_df[c], downcast='integer')
+
+    # Categorical State: equality filters become integer-code compares
+    master_df['State'] = master_df['State'].astype('category')
+    if 'State' in df_mangrove.columns:
+        df_mangrove['State'] = df_mangrove['State'].astype('category')
+
+    # Indexed view for O(1) per-state lookups (drill-down)
+    master_by_state = master_df.set_index('State')
+
+    # Drill-down selectbox options (immutable, cheap for Streamlit to hash)
+    state_options = tuple(sorted(master_df['State'].unique()))
+
+    # (State, year) -> mangrove area, for O(1) drill-down lookups
+    mangrove_lookup = {}
+    if {'State', 'year', 'value'}.issubset(df_mangrove.columns):
+        mangrove_lookup = df_mangrove.groupby(['State', 'year'], observed=True)['value'].sum().to_dict()
+
+    # 5. Precomputed Aggregates (cached with the data, not recomputed per rerun)
+    col_sfr = 'Recorded Forest Area as in SFR 2005'
+    col_cur = 'Recorded Forest Area - Total'
+    total_forest = master_df[col_cur].sum()
+
+    # Change vs 2005 baseline, per state (Leaderboard) and overall (KPI)
+    if col_sfr in df_forest.columns:
+        df_forest['Delta'] = df_forest[col_cur] - df_forest[col_sfr]
+        sfr_2005_total = df_forest[col_sfr].sum()
+        pct_change = ((total_forest - sfr_2005_total) / sfr_2005_total) * 100
+    else:
+        sfr_2005_total = total_forest # Fallback
+        pct_change = 0.0
+
+    # Forest composition (Deep Dive) - top 10 states by total area, melted per forest type
+    quality_cols = [
+        'Recorded Forest Area - Reserved Forests',
+        'Recorded Forest Area - Protected Forests',
+        'Recorded Forest Area - Unclassed Forests',
+    ]
+    top10_forest_states = df_forest.nlargest(10, col_cur)['State'].tolist()
+    quality_long = df_forest[df_forest['State'].isin(top10_forest_states)].melt(
+        id_vars=['State'], value_vars=quality_cols, var_name='Forest Type', value_name='Area'
+    )
+    # Clean labels
+    quality_long['Forest Type'] = quality_long['Forest Type'].str.replace('Recorded Forest Area - ', '')
+
+    # Colorbar range per map metric (Geospatial page)
+    map_metrics = ['Recorded Forest Area - Total', 'Tree Cover - Area', 'Precipitation_mm', 'Mangroves (2023)']
+    max_by_metric = {c: master_df[c].max() for c in map_metrics if c in master_df.columns}
+
+    kpis = {
+        "total_forest": total_forest,
+        "total_tree": master_df['Tree Cover - Area'].sum(),
+        "sfr_2005_total": sfr_2005_total,
+        "pct_change": pct_change
+    }
+
     return {
         "forest": df_forest,
         "tree": df_tree,
         "mangrove": df_mangrove,
         "agro": df_agro,
-        "master": master_df
+        "master": master_df,
+        "master_by_state": master_by_state,
+        "state_options": state_options,
+        "mangrove_lookup": mangrove_lookup,
+        "kpis": kpis,
+        "max_by_metric": max_by_metric,
+        "top10_forest_states": top10_forest_states,
+        "quality_long": quality_long
     }, None
 
 def get_geojson_url():
     # Public GeoJSON for India States
     return "https://gist.githubusercontent.com/jbrobst/56c13bbbf9d97d187fea01ca62ea5112/raw/e388c4cae20aa53cb5090210a42ebb9b765c0a36/india_states.geojson"
+
+# Seconds to wait for the GeoJSON host before giving up
+GEOJSON_TIMEOUT = 15
+
+def load_geojson():
+    # Fetch and parse the India States GeoJSON once so callers can cache the dict
+    # Raises requests.RequestException on network/HTTP/JSON errors
+    response = requests.get(get_geojson_url(), timeout=GEOJSON_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+def downsample_lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a series sorted by x.
+    n_out (e.g. chart width in px) is rounded down to a power of two from 4 up so
+    nearby widths share the same (cacheable) result; n_out <= 2 keeps the endpoints.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    n_out = int(n_out)
+    # Rounding below 4 would leave no buckets, so 3 stays a 1-bucket LTTB
+    if n_out >= 4:
+        n_out = 1 << (n_out.bit_length() - 1)
+    if n_out >= n or n <= 2:
+        return x, y
+    if n_out <= 2:
+        return x[[0, -1]], y[[0, -1]]
+
+    # First & last points are always kept; the rest is split into n_out - 2 buckets
+    every = (n - 2) / (n_out - 2)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # Average of the next bucket is the third triangle vertex
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        # Pick the point forming the largest triangle with the previous pick
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        idx[i + 1] = a
+    return x[idx], y[idx]
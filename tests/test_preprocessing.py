@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import preprocessing as pp
+
+EDGE_CASES = [
+    "2,75,069", "7,187", "421.43", "-5.5", "+7", ".5", "1.", "-.5", "1e3", "1E+3", "2.5e-4",
+    " 12 ", "\t12", "12\n", " 1,000 ", "1 234", "- 5", "1e", "e5", ".", "", "abc", "inf", "nan",
+    "1.2.3", "0x10", "12345678901234567890", "1e30", "9007199254740993", None, np.nan, 1234, 5.25,
+]
+
+
+def _pandas_path(s):
+    return pp._to_numeric_pandas(s.astype(str)).fillna(0).astype(float)
+
+
+@pytest.mark.parametrize("values", [
+    EDGE_CASES,
+    ["1", "2", "3,000"],
+    [1, 2, 3],
+    [1.5, np.nan, 2.25],
+    ["2,75,069", "-5.5", None],
+])
+def test_numba_path_matches_pandas(monkeypatch, values):
+    pytest.importorskip("numba")
+    s = pd.Series(values * (pp.NUMBA_MIN_ROWS // len(values) + 1))
+    assert len(s) > pp.NUMBA_MIN_ROWS
+
+    fast = pp._clean_numeric_col(s)
+    monkeypatch.setattr(pp, "NUMBA_MIN_ROWS", len(s) + 1)
+    slow = pp._clean_numeric_col(s)
+
+    assert fast.dtype == slow.dtype == np.float64
+    np.testing.assert_array_equal(fast.to_numpy(), slow.to_numpy())
+    np.testing.assert_array_equal(fast.to_numpy(), _pandas_path(s).to_numpy())
+
+
+def test_numba_path_matches_pandas_on_random_numbers():
+    pytest.importorskip("numba")
+    rng = np.random.default_rng(0)
+    vals = rng.uniform(-1e7, 1e7, pp.NUMBA_MIN_ROWS + 1)
+    s = pd.Series([f"{v:,.3f}" for v in vals[: len(vals) // 2]] + [f"{v:.6e}" for v in vals[len(vals) // 2:]])
+
+    fast = pp._clean_numeric_col(s)
+    np.testing.assert_array_equal(fast.to_numpy(dtype=float), _pandas_path(s).to_numpy())
+
+
+
+@pytest.mark.parametrize("n_out", [4, 5, 64, 100, 512])
+def test_downsample_lttb_keeps_endpoints_and_length(n_out):
+    x = np.arange(1000.0)
+    y = np.sin(x / 50.0)
+    xs, ys = pp.downsample_lttb(x, y, n_out)
+
+    assert len(xs) == len(ys) == 1 << (n_out.bit_length() - 1)
+    assert xs[0] == x[0] and xs[-1] == x[-1]
+    assert np.all(np.diff(xs) > 0)
+
+
+def test_downsample_lttb_small_n_out_still_reduces():
+    x = np.arange(1000.0)
+    y = np.sin(x / 50.0)
+
+    xs, ys = pp.downsample_lttb(x, y, 3)
+    assert len(xs) == len(ys) == 3
+    assert xs[0] == x[0] and xs[-1] == x[-1]
+
+    for n_out in (0, 1, 2):
+        xs, ys = pp.downsample_lttb(x, y, n_out)
+        np.testing.assert_array_equal(xs, x[[0, -1]])
+        np.testing.assert_array_equal(ys, y[[0, -1]])
+
+
+@pytest.mark.parametrize("n_out", [16, 2000])
+def test_downsample_lttb_returns_input_when_already_short(n_out):
+    x = np.arange(10.0)
+    y = x ** 2
+    xs, ys = pp.downsample_lttb(x, y, n_out)
+
+    np.testing.assert_array_equal(xs, x)
+    np.testing.assert_array_equal(ys, y)